@@ -0,0 +1,168 @@
+import csv
+import heapq
+import logging
+import os
+import threading
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_CSV = os.environ.get('GAZETTEER_CSV', os.path.join(settings.BASE_DIR, 'gazetteer.csv'))
+PRECOMPUTED_PREFIX_LENGTH = 2  # short prefixes are the most common queries, answer them from a table
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+
+
+class GazetteerError(Exception):
+    """The gazetteer CSV is missing or malformed"""
+
+
+class Gazetteer:
+    """Place names from a CSV file, kept in a sorted array for prefix lookups
+
+    The CSV needs `id`, `name`, `longitude`, `latitude` and `population` columns.
+
+    A prefix maps to a contiguous range of the sorted names. The most populous
+    places in that range are found with a segment tree over the populations, so
+    a lookup costs O(limit * log n) however many names share the prefix.
+    """
+
+    def __init__(self, places):
+        self.places = {place['id']: place for place in places}
+        entries = sorted((place['name'].casefold(), -place['population'], place['id'])
+                         for place in self.places.values())
+        self.keys = [key for key, _, _ in entries]
+        self.ids = [place_id for _, _, place_id in entries]
+        self.populations = [-population for _, population, _ in entries]
+
+        # tree[size + i] = i; every inner node holds the index of its most populous leaf
+        self.size = len(entries)
+        self.tree = array('i', [0] * self.size) + array('i', range(self.size))
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = self._more_populous(self.tree[2 * node], self.tree[2 * node + 1])
+
+        self.top_by_prefix = {}
+        for key in self.keys:
+            for length in range(1, min(len(key), PRECOMPUTED_PREFIX_LENGTH) + 1):
+                prefix = key[:length]
+                if prefix not in self.top_by_prefix:
+                    self.top_by_prefix[prefix] = self._top_for_prefix(prefix, MAX_AUTOCOMPLETE_LIMIT)
+
+    @classmethod
+    def from_csv(cls, path):
+        try:
+            with open(path, newline='', encoding='utf-8') as file:
+                places = [{
+                    'id': row['id'],
+                    'name': row['name'],
+                    'coordinates': [float(row['longitude']), float(row['latitude'])],
+                    'population': int(row.get('population') or 0),
+                } for row in csv.DictReader(file)]
+        except OSError as e:
+            raise GazetteerError(f"Gazetteer unavailable: {e}")
+        except (KeyError, ValueError, TypeError) as e:
+            raise GazetteerError(f"Malformed gazetteer {path}: {e!r}")
+        return cls(places)
+
+    def _more_populous(self, left, right):
+        # Ties go to the earlier name, matching the sort order of the array
+        if self.populations[right] > self.populations[left] or (
+                self.populations[right] == self.populations[left] and right < left):
+            return right
+        return left
+
+    def _most_populous(self, start, end):
+        """Index of the most populous place in keys[start:end]; the range must not be empty"""
+        best = None
+        start += self.size
+        end += self.size
+        while start < end:
+            if start & 1:
+                best = self.tree[start] if best is None else self._more_populous(best, self.tree[start])
+                start += 1
+            if end & 1:
+                end -= 1
+                best = self.tree[end] if best is None else self._more_populous(best, self.tree[end])
+            start //= 2
+            end //= 2
+        return best
+
+    def _top_for_prefix(self, prefix, limit):
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + chr(0x10FFFF), start)
+        heap = []
+
+        def push(range_start, range_end):
+            if range_start < range_end:
+                index = self._most_populous(range_start, range_end)
+                heapq.heappush(heap, (-self.populations[index], index, range_start, range_end))
+
+        push(start, end)
+        place_ids = []
+        while heap and len(place_ids) < limit:
+            _, index, range_start, range_end = heapq.heappop(heap)
+            place_ids.append(self.ids[index])
+            push(range_start, index)
+            push(index + 1, range_end)
+        return place_ids
+
+    def autocomplete(self, query, limit=AUTOCOMPLETE_LIMIT):
+        """Return up to `limit` places whose name starts with `query`, most populous first"""
+        prefix = query.strip().casefold()
+        if not prefix:
+            return []
+        if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH and limit <= MAX_AUTOCOMPLETE_LIMIT:
+            place_ids = self.top_by_prefix.get(prefix, [])[:limit]
+        else:
+            place_ids = self._top_for_prefix(prefix, limit)
+        return [self.places[place_id] for place_id in place_ids]
+
+    def resolve(self, place_id):
+        try:
+            return self.places[place_id]['coordinates']
+        except KeyError:
+            raise ValueError(f"Unknown place id: {place_id}")
+
+
+_gazetteer = None
+_load_error = None
+_load_lock = threading.Lock()
+
+
+def load_gazetteer():
+    """Parse the gazetteer CSV once per process
+
+    Server entry points call this at startup so requests never pay for it;
+    management commands and tests only load it if they use it. A failed load
+    is logged and remembered until the process restarts.
+    """
+    global _gazetteer, _load_error
+    if _gazetteer is not None:
+        return _gazetteer
+    with _load_lock:
+        if _gazetteer is None and _load_error is None:
+            try:
+                _gazetteer = Gazetteer.from_csv(GAZETTEER_CSV)
+            except GazetteerError as e:
+                logger.warning("Place autocomplete disabled: %s", e)
+                _load_error = e
+    return _gazetteer
+
+
+def get_gazetteer():
+    gazetteer = load_gazetteer()
+    if gazetteer is None:
+        raise _load_error
+    return gazetteer
+
+
+def resolve_place_ids(data):
+    """Replace place ids in the directions payload with their [lon, lat] coordinates"""
+    resolved = dict(data)
+    for field in ('current', 'pickup', 'dropoff'):
+        if isinstance(resolved.get(field), str):
+            resolved[field] = get_gazetteer().resolve(resolved[field])
+    return resolved
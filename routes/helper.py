@@ -5,10 +5,25 @@ from datetime import datetime, timedelta
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
 from reportlab.lib.styles import getSampleStyleSheet
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import io
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+
+def _env_int(name, default):
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
 
 MAPBOX_ACCESS_TOKEN = os.environ.get('MAPBOX_ACCESS_TOKEN')
+PDF_RENDER_WORKERS = _env_int('PDF_RENDER_WORKERS', os.cpu_count() or 1)
 
 
 def calculate_route_mapbox(request_data):
@@ -136,8 +151,13 @@ def calculate_route_mapbox(request_data):
 
 # Draw duty grid with 12, 1, 2, ..., 11, 12 labels
 def draw_duty_grid(duty_statuses):
-    """Draw duty status grid using matplotlib"""
-    fig, ax = plt.subplots(figsize=(10, 2))
+    """Draw duty status grid using matplotlib
+
+    Builds a Figure directly rather than through pyplot, whose global current
+    figure is shared between the server's request threads.
+    """
+    fig = Figure(figsize=(10, 2))
+    ax = fig.subplots()
     ax.set_xlim(0, 24)
     ax.set_ylim(0, 4)
     ax.set_yticks([0.5, 1.5, 2.5, 3.5])
@@ -158,12 +178,71 @@ def draw_duty_grid(duty_statuses):
 
     ax.set_title("Duty Status Grid")
     buf = io.BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight")
-    plt.close()
+    fig.savefig(buf, format="png", bbox_inches="tight")
     buf.seek(0)
     return buf
 
 
+def _render_duty_grid_png(duty_statuses):
+    """Render one duty grid in a worker process and return the raw PNG bytes"""
+    return draw_duty_grid(duty_statuses).getvalue()
+
+
+_render_executor = None
+_render_executor_lock = threading.Lock()
+
+
+def _get_render_executor():
+    """Return the process pool shared by every PDF export in this server process
+
+    Workers are started with the `spawn` method: forking a threaded Django server
+    can deadlock, and a single shared pool caps the number of rendering processes
+    at PDF_RENDER_WORKERS however many exports run at once. The workers stay up
+    between exports, so only the first export pays for starting them.
+    """
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is None:
+            _render_executor = ProcessPoolExecutor(max_workers=PDF_RENDER_WORKERS,
+                                                   mp_context=multiprocessing.get_context('spawn'))
+        return _render_executor
+
+
+def _discard_render_executor(executor):
+    """Drop a broken pool so the next export starts a fresh one"""
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is executor:
+            _render_executor = None
+    executor.shutdown(wait=False)
+
+
+def render_duty_grids(logs):
+    """Yield the duty grid of every log as PNG bytes, in order
+
+    Each day is a separate pool task, so a trip's days are drawn on as many
+    cores as are free. If a worker dies the pool is replaced and the remaining
+    days are drawn inline.
+    """
+    duty_statuses = [log["Duty Statuses"] for log in logs]
+    if PDF_RENDER_WORKERS <= 1 or len(logs) < 2:
+        for statuses in duty_statuses:
+            yield _render_duty_grid_png(statuses)
+        return
+
+    executor = _get_render_executor()
+    chunksize = math.ceil(len(logs) / PDF_RENDER_WORKERS)
+    rendered = 0
+    try:
+        for grid_png in executor.map(_render_duty_grid_png, duty_statuses, chunksize=chunksize):
+            yield grid_png
+            rendered += 1
+    except BrokenProcessPool:
+        _discard_render_executor(executor)
+        for statuses in duty_statuses[rendered:]:
+            yield _render_duty_grid_png(statuses)
+
+
 def generate_daily_logs(route_data, driver_info, start_date):
     """Generate daily log data based on route data with HOS limits"""
     total_distance = route_data['total_distance']
@@ -293,12 +372,17 @@ def generate_daily_logs(route_data, driver_info, start_date):
 
 
 def create_pdf(logs, filename="driver_log_sheets.pdf"):
-    """Create PDF with log sheets"""
+    """Create PDF with log sheets
+
+    `filename` may be a path or any writable file object (e.g. a temporary file),
+    so the document is written straight to its destination.
+    """
     doc = SimpleDocTemplate(filename, pagesize=letter)
     styles = getSampleStyleSheet()
     story = []
+    grid_images = render_duty_grids(logs)
 
-    for log in logs:
+    for log, grid_png in zip(logs, grid_images):
         story.append(Paragraph(f"{log['Day']}", styles['Heading1']))
         story.append(Paragraph(f"Driver: {log['Driver']}", styles['Normal']))
         story.append(Paragraph(f"Carrier: {log['Carrier']}", styles['Normal']))
@@ -309,8 +393,7 @@ def create_pdf(logs, filename="driver_log_sheets.pdf"):
         story.append(Paragraph(f"On Duty Hours: {log['On Duty Hours']}", styles['Normal']))
         story.append(Spacer(1, 12))
 
-        grid_image = draw_duty_grid(log["Duty Statuses"])
-        story.append(Image(grid_image, width=500, height=100))
+        story.append(Image(io.BytesIO(grid_png), width=500, height=100))
         story.append(Spacer(1, 12))
 
         story.append(Paragraph(f"Remarks: {log['Remarks']}", styles['Normal']))
@@ -1,3 +1,227 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from routes import gazetteer, helper
+from routes.helper import generate_daily_logs
+
+
+def make_log(day):
+    return {
+        "Day": f"Day {day} - 2025-03-{day:02d}",
+        "Driver": "John Doe",
+        "Carrier": "ABC Trucking",
+        "Truck Number": "4567",
+        "Starting Odometer": 150000,
+        "Ending Odometer": 150500,
+        "Total Miles Driven": 500,
+        "Duty Statuses": {
+            "Off Duty": [(0, 8)],
+            "Sleeper Berth": [],
+            "Driving": [(8.5, 8.5 + day * 0.5)],
+            "On Duty Not Dr": [(8, 8.5)],
+        },
+        "Remarks": "",
+        "On Duty Hours": 0.5 + day * 0.5,
+    }
+
+
+ROUTE_DATA = {
+    'total_distance': 2000,
+    'segments': [{'start': [-118.24, 34.05], 'end': [-85.76, 38.25], 'distance': 2000, 'duration': 36}],
+    'stops': [
+        {'type': 'pickup', 'location': [-118.24, 34.05], 'duration': 1.0},
+        {'type': 'dropoff', 'location': [-85.76, 38.25], 'duration': 1.0},
+    ],
+}
+DRIVER_INFO = {'name': 'John Doe', 'carrier': 'ABC Trucking', 'truck_number': '4567'}
+
+
+class RenderDutyGridsTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        if helper._render_executor is not None:
+            helper._render_executor.shutdown()
+            helper._render_executor = None
+        super().tearDownClass()
+
+    def render(self, logs):
+        with mock.patch.object(helper, 'PDF_RENDER_WORKERS', 2), \
+                mock.patch.object(helper, '_get_render_executor', wraps=helper._get_render_executor) as executor:
+            grids = list(helper.render_duty_grids(logs))
+        return grids, executor.called
+
+    def assert_grids_in_order(self, logs, expect_pool):
+        expected = [helper._render_duty_grid_png(log["Duty Statuses"]) for log in logs]
+        grids, used_pool = self.render(logs)
+        self.assertEqual(used_pool, expect_pool)
+        self.assertEqual(grids, expected)
+        for grid in grids:
+            self.assertTrue(grid.startswith(b'\x89PNG'))
+
+    def test_single_day_renders_inline(self):
+        self.assert_grids_in_order([make_log(1)], expect_pool=False)
+
+    def test_multi_day_export_renders_in_pool(self):
+        self.assert_grids_in_order([make_log(day) for day in range(1, 6)], expect_pool=True)
+
+    def test_generated_trip_renders_in_pool(self):
+        logs = generate_daily_logs(ROUTE_DATA, DRIVER_INFO, "2025-03-24")
+        self.assertGreater(len(logs), 1)
+        self.assert_grids_in_order(logs, expect_pool=True)
+
+    def test_broken_pool_falls_back_to_inline(self):
+        logs = [make_log(day) for day in range(1, 4)]
+        broken = mock.Mock()
+        broken.map.side_effect = BrokenProcessPool()
+        with mock.patch.object(helper, 'PDF_RENDER_WORKERS', 2), \
+                mock.patch.object(helper, '_get_render_executor', return_value=broken):
+            grids = list(helper.render_duty_grids(logs))
+        self.assertEqual(grids, [helper._render_duty_grid_png(log["Duty Statuses"]) for log in logs])
+        broken.shutdown.assert_called_once_with(wait=False)
+
+    def assert_valid_pdf(self, output):
+        pdf = output.getvalue()
+        self.assertTrue(pdf.startswith(b'%PDF-'))
+        self.assertIn(b'%%EOF', pdf[-1024:])
+
+    def test_create_pdf_writes_to_file_object(self):
+        output = io.BytesIO()
+        helper.create_pdf([make_log(1), make_log(2)], output)
+        self.assert_valid_pdf(output)
+
+    def test_create_pdf_from_generated_trip_uses_pool(self):
+        logs = generate_daily_logs(ROUTE_DATA, DRIVER_INFO, "2025-03-24")
+        output = io.BytesIO()
+        with mock.patch.object(helper, 'PDF_RENDER_WORKERS', 2), \
+                mock.patch.object(helper, '_get_render_executor', wraps=helper._get_render_executor) as executor:
+            helper.create_pdf(logs, output)
+        executor.assert_called_once()
+        self.assert_valid_pdf(output)
+
+
+PLACES = [
+    {'id': '1', 'name': 'Los Angeles', 'coordinates': [-118.24, 34.05], 'population': 3900000},
+    {'id': '2', 'name': 'Louisville', 'coordinates': [-85.76, 38.25], 'population': 620000},
+    {'id': '3', 'name': 'Lodi', 'coordinates': [-121.27, 38.13], 'population': 66000},
+    {'id': '4', 'name': 'Boston', 'coordinates': [-71.06, 42.36], 'population': 650000},
+    {'id': '5', 'name': 'L', 'coordinates': [0.0, 0.0], 'population': 10},
+    {'id': '6', 'name': 'Lo\U0001F69A Stop', 'coordinates': [1.0, 1.0], 'population': 5},
+]
+
+
+class GazetteerTests(SimpleTestCase):
+    def setUp(self):
+        self.gazetteer = gazetteer.Gazetteer(PLACES)
+
+    def ids(self, query, limit=gazetteer.AUTOCOMPLETE_LIMIT):
+        return [place['id'] for place in self.gazetteer.autocomplete(query, limit)]
+
+    def test_prefix_match_ordered_by_population(self):
+        self.assertEqual(self.ids('lou'), ['2'])
+        self.assertEqual(self.ids('  LO '), ['1', '2', '3', '6'])
+        self.assertEqual(self.ids('l'), ['1', '2', '3', '5', '6'])
+        self.assertEqual(self.ids('x'), [])
+        self.assertEqual(self.ids(''), [])
+
+    def test_precomputed_and_range_paths_match_brute_force(self):
+        places = [{'id': str(i), 'name': f'{"ab"[i % 2]}{"xyz"[i % 3]}{i % 7} town', 'coordinates': [0.0, 0.0],
+                   'population': (i * 37) % 11} for i in range(200)]
+        index = gazetteer.Gazetteer(places)
+        by_id = {place['id']: place for place in places}
+        ranked = sorted(places, key=lambda place: (-place['population'], place['name'].casefold(), place['id']))
+        for query in ('a', 'b', 'ax', 'bz', 'ax3', 'by5 t', 'q'):
+            for limit in (1, 10, gazetteer.MAX_AUTOCOMPLETE_LIMIT, gazetteer.MAX_AUTOCOMPLETE_LIMIT + 1):
+                expected = [place['id'] for place in ranked if place['name'].startswith(query)][:limit]
+                found = [place['id'] for place in index.autocomplete(query, limit)]
+                self.assertEqual(found, expected, (query, limit))
+                self.assertTrue(all(by_id[place_id]['name'].startswith(query) for place_id in found))
+
+    def test_one_letter_names_listed_once(self):
+        index = gazetteer.Gazetteer([
+            {'id': '1', 'name': 'A', 'coordinates': [0.0, 0.0], 'population': 5},
+            {'id': '2', 'name': 'Ab', 'coordinates': [0.0, 0.0], 'population': 3},
+        ])
+        self.assertEqual([place['id'] for place in index.autocomplete('a')], ['1', '2'])
+
+    def test_astral_plane_names_match(self):
+        self.assertEqual(self.ids('lo\U0001F69A'), ['6'])
+
+    def test_limit(self):
+        self.assertEqual(self.ids('l', 2), ['1', '2'])
+        self.assertEqual(self.ids('lo', 2), ['1', '2'])
+
+    def test_resolve(self):
+        self.assertEqual(self.gazetteer.resolve('4'), [-71.06, 42.36])
+        with self.assertRaises(ValueError):
+            self.gazetteer.resolve('missing')
+
+    def test_resolve_place_ids(self):
+        with mock.patch.object(gazetteer, '_gazetteer', self.gazetteer):
+            data = gazetteer.resolve_place_ids({'current': '4', 'pickup': [1.0, 2.0], 'dropoff': '1'})
+            with self.assertRaises(ValueError):
+                gazetteer.resolve_place_ids({'current': 'missing'})
+        self.assertEqual(data, {'current': [-71.06, 42.36], 'pickup': [1.0, 2.0], 'dropoff': [-118.24, 34.05]})
+
+    def test_malformed_csv_raises_gazetteer_error(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'gazetteer.csv')
+            with open(path, 'w') as file:
+                file.write('id,name,longitude,latitude,population\n1,Lodi,west,38.13,66000\n')
+            with self.assertRaises(gazetteer.GazetteerError):
+                gazetteer.Gazetteer.from_csv(path)
+            with self.assertRaises(gazetteer.GazetteerError):
+                gazetteer.Gazetteer.from_csv(os.path.join(directory, 'missing.csv'))
+
+
+@mock.patch.object(gazetteer, '_gazetteer', gazetteer.Gazetteer(PLACES))
+class PlaceViewsTests(SimpleTestCase):
+    def test_autocomplete(self):
+        response = self.client.get('/api/places/autocomplete/', {'q': 'lo', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([place['id'] for place in response.json()['places']], ['1', '2'])
+
+    def test_autocomplete_rejects_non_integer_limit(self):
+        response = self.client.get('/api/places/autocomplete/', {'q': 'lo', 'limit': 'ten'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_autocomplete_clamps_limit(self):
+        for limit, clamped in (('0', 1), ('-5', 1), ('1000', gazetteer.MAX_AUTOCOMPLETE_LIMIT)):
+            with mock.patch.object(gazetteer._gazetteer, 'autocomplete', return_value=[]) as autocomplete:
+                response = self.client.get('/api/places/autocomplete/', {'q': 'lo', 'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            autocomplete.assert_called_once_with('lo', clamped)
+
+    def test_autocomplete_rejects_post(self):
+        response = self.client.post('/api/places/autocomplete/', {'q': 'lo'})
+        self.assertEqual(response.status_code, 405)
+
+    def test_autocomplete_without_gazetteer(self):
+        with mock.patch.object(gazetteer, '_gazetteer', None), \
+                mock.patch.object(gazetteer, '_load_error', gazetteer.GazetteerError('Gazetteer unavailable')):
+            response = self.client.get('/api/places/autocomplete/', {'q': 'lo'})
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {'error': 'Gazetteer unavailable'})
+
+    def test_trip_endpoints_reject_unknown_place_id(self):
+        payload = {'current': 'missing', 'pickup': '1', 'dropoff': [-71.06, 42.36]}
+        for url in ('/api/directions/', '/api/logs/pdf/'):
+            with mock.patch('routes.views.calculate_route_mapbox') as calculate_route_mapbox:
+                response = self.client.post(url, payload, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'Unknown place id: missing'})
+            calculate_route_mapbox.assert_not_called()
+
+    def test_trip_endpoints_resolve_place_ids(self):
+        payload = {'current': '4', 'pickup': '1', 'dropoff': '2'}
+        for url in ('/api/directions/', '/api/logs/pdf/'):
+            with mock.patch('routes.views.calculate_route_mapbox', return_value=ROUTE_DATA) as calculate_route_mapbox, \
+                    mock.patch.object(helper, 'PDF_RENDER_WORKERS', 1):
+                response = self.client.post(url, payload, content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            calculate_route_mapbox.assert_called_once_with(
+                {'current': [-71.06, 42.36], 'pickup': [-118.24, 34.05], 'dropoff': [-85.76, 38.25]})
@@ -3,4 +3,6 @@ from . import views
 
 urlpatterns = [
     path('directions/', views.calculate_route, name='calculate_route'),
+    path('logs/pdf/', views.download_log_sheets, name='download_log_sheets'),
+    path('places/autocomplete/', views.autocomplete_places, name='autocomplete_places'),
 ]
\ No newline at end of file
@@ -1,9 +1,13 @@
+import tempfile
+
 import requests
-from django.http import JsonResponse
+from django.http import FileResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from pydantic import ValidationError
 
-from routes.helper import calculate_route_mapbox, generate_daily_logs
+from routes.gazetteer import (AUTOCOMPLETE_LIMIT, MAX_AUTOCOMPLETE_LIMIT, GazetteerError, get_gazetteer,
+                              resolve_place_ids)
+from routes.helper import calculate_route_mapbox, create_pdf, generate_daily_logs
 from routes.validators import PositionData
 
 
@@ -13,20 +17,26 @@ driver_info = {
     "truck_number": "4567"
 }
 
-@csrf_exempt
-def calculate_route(request):
+TRIP_START_DATE = "2025-03-24"
+PDF_SPOOL_MAX_SIZE = 1024 * 1024  # bytes kept in memory before spilling to disk
+
+
+def handle_trip_request(request, respond):
+    """Validate a trip request, plan the route and daily logs, then build the response with `respond`"""
     if request.method == 'POST':
         import json
         try:
-            data = json.loads(request.body)
+            data = resolve_place_ids(json.loads(request.body))
             PositionData(**data)
             route_data = calculate_route_mapbox(data)
             print('>>>>>>>>>>>> logs code 1')
-            logs = generate_daily_logs(route_data, driver_info, "2025-03-24")
+            logs = generate_daily_logs(route_data, driver_info, TRIP_START_DATE)
             print('>>>>>>>>>>>> logs code 2' )
-            return JsonResponse({"route": route_data, "logs": logs})
+            return respond(route_data, logs)
         except requests.exceptions.RequestException as e:
             return JsonResponse({'error': str(e)}, status=500)
+        except GazetteerError as e:
+            return JsonResponse({'error': str(e)}, status=500)
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
         except ValidationError as e:
@@ -41,3 +51,40 @@ def calculate_route(request):
             return JsonResponse({'error': str(e)}, status=400)
     else:
         return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
+@csrf_exempt
+def calculate_route(request):
+    return handle_trip_request(request, lambda route_data, logs: JsonResponse({"route": route_data, "logs": logs}))
+
+
+def _log_sheets_response(route_data, logs):
+    pdf_file = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+    try:
+        create_pdf(logs, pdf_file)
+    except BaseException:
+        pdf_file.close()
+        raise
+    pdf_file.seek(0)
+    return FileResponse(pdf_file, as_attachment=True, filename="driver_log_sheets.pdf",
+                        content_type='application/pdf')
+
+
+@csrf_exempt
+def download_log_sheets(request):
+    return handle_trip_request(request, _log_sheets_response)
+
+
+def autocomplete_places(request):
+    if request.method == 'GET':
+        try:
+            limit = int(request.GET.get('limit', AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            return JsonResponse({'error': 'limit must be an integer'}, status=400)
+        try:
+            places = get_gazetteer().autocomplete(request.GET.get('q', ''), max(1, min(limit, MAX_AUTOCOMPLETE_LIMIT)))
+        except GazetteerError as e:
+            return JsonResponse({'error': str(e)}, status=500)
+        return JsonResponse({'places': places})
+    else:
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
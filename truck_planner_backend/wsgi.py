@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'truck_planner_backend.settings')
 
 application = get_wsgi_application()
+
+# Build the place autocomplete index before serving requests
+from routes.gazetteer import load_gazetteer  # noqa: E402
+
+load_gazetteer()